@@ -8,11 +8,29 @@ import streamlit as st
 import io
 import time
 import base64
+import asyncio
+import functools
+import random
+import json
+import hashlib
+import shutil
+import threading
+from pathlib import Path
+from collections import deque
+from itertools import islice
 from dataclasses import dataclass
-from typing import List, Optional
-from openai import OpenAI
+from typing import List, Optional, Tuple
+from openai import AsyncOpenAI, APIStatusError, APIConnectionError
 from PIL import Image
 
+from roles import MODELS, ROLE_INFO, ROLE_LABELS, SIZES, Role
+from utils import style_prompt
+
+try:
+    import tiktoken
+except ImportError:  # listed in requirements.txt; without it history tokens are estimated at ~4 chars/token
+    tiktoken = None
+
 # ------------------------------------------------------------
 # 🌈 Page Setup
 # ------------------------------------------------------------
@@ -30,63 +48,18 @@ st.sidebar.markdown("### 🔑 API & Role Settings")
 api_key = st.sidebar.text_input("Enter your OpenAI API Key", type="password")
 model = st.sidebar.selectbox(
     "Model",
-    ["gpt-4.1-mini", "gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo"],
+    MODELS,
     index=0
 )
 
 role = st.sidebar.selectbox(
     "Choose a role 🎭",
-    [
-        "Video Director 🎬",
-        "Fashion Designer 👗",
-        "Storyboard Artist ✏️",
-        "Graphic Designer 🎨",
-        "Performer 🎭"
-    ],
-    index=0
+    tuple(Role),
+    index=0,
+    format_func=ROLE_LABELS.__getitem__
 )
 
-# Role descriptions & system prompts
-ROLE_DESCRIPTIONS = {
-    "Video Director 🎬": {
-        "desc": "Analyzes mood, camera angle, lighting.",
-        "prompt": (
-            "You are a professional film director. Always analyze ideas in terms of visual storytelling — "
-            "use camera movement, lighting, framing, editing, and emotional tone to explain your thoughts. "
-            "Describe concepts as if you are planning a film scene or visual sequence."
-        )
-    },
-    "Fashion Designer 👗": {
-        "desc": "Focuses on color harmony, texture, silhouette.",
-        "prompt": (
-            "You are an avant-garde fashion designer. Think in terms of form, fabric, tone, "
-            "and how clothing expresses emotion, era, and identity."
-        )
-    },
-    "Storyboard Artist ✏️": {
-        "desc": "Creates composition sketches, camera layout, and timing cues.",
-        "prompt": (
-            "You are a storyboard artist. Visualize action beats, body language, and composition. "
-            "Explain the scene framing with cinematic clarity."
-        )
-    },
-    "Graphic Designer 🎨": {
-        "desc": "Balances composition, typography, and color palette.",
-        "prompt": (
-            "You are a professional graphic designer. Focus on layout, composition, and how design communicates mood. "
-            "Think visually and describe spatial balance and rhythm."
-        )
-    },
-    "Performer 🎭": {
-        "desc": "Analyzes emotion, posture, gesture, and audience impact.",
-        "prompt": (
-            "You are a stage performer and actor. Express emotional tone, gesture, and performance dynamics. "
-            "Explain how to evoke empathy and rhythm in storytelling."
-        )
-    },
-}
-
-role_info = ROLE_DESCRIPTIONS[role]
+role_info = ROLE_INFO[role]
 st.sidebar.markdown(f"**Role description:** {role_info['desc']}")
 with st.sidebar.expander("🧠 System prompt used for this role"):
     st.markdown(role_info["prompt"])
@@ -94,8 +67,10 @@ with st.sidebar.expander("🧠 System prompt used for this role"):
 # ------------------------------------------------------------
 # 🧠 Session States
 # ------------------------------------------------------------
+CHAT_HISTORY_MAXLEN = 40  # older turns are evicted automatically
+
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = deque(maxlen=CHAT_HISTORY_MAXLEN)
 if "history" not in st.session_state:
     st.session_state.history = []
 
@@ -103,34 +78,380 @@ if "history" not in st.session_state:
 # ------------------------------------------------------------
 # 🧩 Helpers
 # ------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """One background event loop for all sessions.
+
+    A cached AsyncOpenAI client keeps its connection pool bound to the loop it first ran on,
+    so every call goes through this long-lived loop rather than a fresh asyncio.run() loop.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="openai-loop", daemon=True).start()
+    return loop
+
+
+def run_async(coro):
+    """Run `coro` on the shared loop and block this script thread until it finishes.
+
+    If the wait is interrupted (e.g. Streamlit aborting the run on a new click), the coroutine
+    is cancelled so it does not keep running, and retrying, on the shared loop.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _event_loop())
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+async def _anext(agen):
+    return await agen.__anext__()
+
+
+def iter_async(agen):
+    """Drive an async generator from the script thread, one item per loop round-trip."""
+    while True:
+        try:
+            yield run_async(_anext(agen))
+        except StopAsyncIteration:
+            return
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _build_client(api_key: str) -> AsyncOpenAI:
+    """One OpenAI client per key, shared across reruns so its connection pool is reused.
+
+    SDK retries are off: `with_retry` is the only retry layer.
+    """
+    return AsyncOpenAI(api_key=api_key, max_retries=0)
+
+
+MAX_RETRIES = 3
+MAX_RETRY_DELAY = 30.0  # seconds; caps a server's Retry-After so the script thread is not parked indefinitely
+
+
+def _is_retryable(err: Exception) -> bool:
+    if isinstance(err, APIConnectionError):
+        return True
+    return isinstance(err, APIStatusError) and (err.status_code == 429 or err.status_code >= 500)
+
+
+def _retry_after(err: Exception) -> Optional[float]:
+    """Server-requested delay from a Retry-After header (seconds form only), if any."""
+    response = getattr(err, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+async def with_retry(make_call):
+    """Await `make_call()`, retrying 429/5xx/connection errors with exponential backoff + jitter.
+
+    A Retry-After header, when present, takes precedence over the backoff schedule.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return await make_call()
+        except Exception as e:
+            if attempt == MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = 2 ** attempt + random.random()
+            await asyncio.sleep(min(delay, MAX_RETRY_DELAY))
+
+
 def get_client():
     if not api_key:
         return None
     try:
-        return OpenAI(api_key=api_key)
+        return _build_client(api_key)
+    except Exception:
+        return None
+
+
+CHAT_HISTORY_WINDOW = 20   # most recent messages sent to the API
+CHAT_TOKEN_BUDGET = 6000   # upper bound on history tokens per request
+
+
+@functools.lru_cache(maxsize=16)
+def _encoding_for(model: str):
+    """tiktoken encoding for `model`, or None if unavailable.
+
+    The first load downloads the BPE file, which fails on offline hosts; the None is cached
+    too, so such a model falls back to the estimate without retrying the download on every call.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
     except Exception:
         return None
 
 
-def generate_chat_response(prompt):
-    """Generate chat response with OpenAI API."""
+@functools.lru_cache(maxsize=4096)
+def _count_tokens(model: str, text: str) -> int:
+    encoding = _encoding_for(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def windowed_history(model: str, history) -> tuple:
+    """Last CHAT_HISTORY_WINDOW messages as (role, content) pairs, trimmed oldest-first to the token budget."""
+    recent = list(islice(reversed(history), CHAT_HISTORY_WINDOW))[::-1]
+    costs = [_count_tokens(model, msg["content"]) for msg in recent]
+    total = sum(costs)
+    start = 0
+    while start < len(recent) and total > CHAT_TOKEN_BUDGET:
+        total -= costs[start]
+        start += 1
+    return tuple((msg["role"], msg["content"]) for msg in recent[start:])
+
+
+class _ChatCacheMiss(Exception):
+    """Raised by `_cached_chat` when no stored answer exists yet (exceptions are never cached)."""
+
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _cached_chat(api_key: str, model: str, system_prompt: str, history_tuple: tuple, user_prompt: str,
+                 _fresh_text: Optional[str] = None) -> str:
+    """Answer store keyed on (key, model, role prompt, history, prompt).
+
+    Streaming has to happen outside the cached function (Streamlit would replay every
+    placeholder update on a hit), so this only looks up an answer or, on the second call
+    after a miss, stores the streamed `_fresh_text`. The API key is part of the cache key
+    so one user's answers are never served to another.
+    """
+    if _fresh_text is None:
+        raise _ChatCacheMiss()
+    return _fresh_text
+
+
+async def _chat_deltas(client: AsyncOpenAI, model: str, messages: list):
+    stream = await with_retry(lambda: client.chat.completions.create(model=model, messages=messages, stream=True))
+    async for chunk in stream:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content or ""
+
+
+def _stream_chat(client, model: str, system_prompt: str, history_tuple: tuple, user_prompt: str) -> str:
+    """Stream a chat completion into a placeholder token by token and return the full text."""
+    messages = [
+        {"role": "system", "content": system_prompt},
+        *({"role": msg_role, "content": msg_content} for msg_role, msg_content in history_tuple),
+        {"role": "user", "content": user_prompt},
+    ]
+
+    placeholder = st.empty()
+    buf = []
+    for delta in iter_async(_chat_deltas(client, model, messages)):
+        buf.append(delta)
+        placeholder.markdown("".join(buf))
+    return "".join(buf)
+
+
+def chat_request_key(prompt) -> tuple:
+    """Everything that determines the answer to `prompt` right now; the `_cached_chat` key."""
+    return (api_key, model, role_info["prompt"], windowed_history(model, st.session_state.chat_history), prompt)
+
+
+DUPLICATE_SUBMIT_WINDOW = 2.0  # seconds
+
+
+def is_duplicate_submit(key: tuple) -> bool:
+    """True if request `key` was just answered and nothing else changed since (double-click / fast rerun)."""
+    return (
+        st.session_state.get("last_submit_key") == hash(key)
+        and time.time() - st.session_state.get("last_submit_ts", 0.0) < DUPLICATE_SUBMIT_WINDOW
+    )
+
+
+def mark_submitted(key: tuple) -> None:
+    """Remember the post-answer request `key`, so re-submitting the same prompt matches it.
+
+    Only called once the answer is in history: an aborted, failed or empty call must leave
+    no marker, or the user's retry would be skipped as already answered.
+    """
+    st.session_state.last_submit_key = hash(key)
+    st.session_state.last_submit_ts = time.time()
+
+
+def generate_chat_response(key: tuple):
+    """Generate the chat response for a `chat_request_key`, rendering it (streamed on a cache miss) in place."""
     client = get_client()
     if not client:
         st.error("⚠️ Please enter a valid API Key.")
         return None
 
-    messages = [{"role": "system", "content": role_info["prompt"]}]
-    for msg in st.session_state.chat_history:
-        messages.append({"role": msg["role"], "content": msg["content"]})
-    messages.append({"role": "user", "content": prompt})
+    try:
+        content = _cached_chat(*key)
+        st.markdown(content)
+        return content
+    except _ChatCacheMiss:
+        pass
+    content = _stream_chat(client, *key[1:])
+    if not content:
+        # An empty stream is not an answer; caching it would swallow every resubmit for the TTL.
+        return content
+    return _cached_chat(*key, _fresh_text=content)
+
+
+MAX_CONCURRENT_IMAGE_REQUESTS = 8
+
+
+async def _generate_one_image(client: AsyncOpenAI, sem: asyncio.Semaphore, **params) -> bytes:
+    """Generate a single image as PNG bytes."""
+    async with sem:
+        result = await with_retry(lambda: client.images.generate(n=1, **params))
+        return base64.b64decode(result.data[0].b64_json)
+
 
-    resp = client.chat.completions.create(model=model, messages=messages)
-    content = resp.choices[0].message.content
-    return content
+async def _fanout(client: AsyncOpenAI, n_images: int, **params) -> Tuple[List[bytes], List[Exception]]:
+    """Issue `n_images` single-image requests concurrently.
 
+    Returns (PNG bytes of the images that succeeded, errors of those that failed), so one
+    failed request does not throw away images that were already generated and paid for.
+    """
+    sem = asyncio.Semaphore(MAX_CONCURRENT_IMAGE_REQUESTS)
+    results = await asyncio.gather(
+        *[_generate_one_image(client, sem, **params) for _ in range(n_images)],
+        return_exceptions=True,
+    )
+    images = [r for r in results if not isinstance(r, BaseException)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    return images, errors
+
+
+IMAGE_CACHE_DIR = Path(__file__).parent / "cache" / "images"
+
+
+def image_cache_key(api_key: str, **params) -> str:
+    """Stable hash of every parameter that affects the generated images, scoped to the API key.
+
+    Like the chat cache, one key's paid generations are never served to another key. Only
+    a digest of the key is hashed in; it is never written into the manifest.
+    """
+    owner = hashlib.blake2b(api_key.encode("utf-8"), digest_size=16).hexdigest()
+    blob = json.dumps({"owner": owner, **params}, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+def _run_stamp(entry: Path) -> int:
+    return int(entry.name.rsplit("-", 1)[1])
+
+
+def load_cached_images(key: str) -> Optional[List[str]]:
+    """Return the PNG paths of the newest complete run stored for `key`, or None on a miss."""
+    for entry in sorted(IMAGE_CACHE_DIR.glob(f"{key}-*"), key=_run_stamp, reverse=True):
+        try:
+            manifest = json.loads((entry / "manifest.json").read_text(encoding="utf-8"))
+            files = manifest["files"]
+        except (OSError, ValueError, KeyError):
+            continue
+        if not manifest.get("complete", False):
+            continue
+        paths = [entry / f for f in files]
+        if all(p.is_file() for p in paths):
+            return [str(p) for p in paths]
+    return None
+
+
+def store_cached_images(key: str, params: dict, images_png: List[bytes], complete: bool = True) -> List[str]:
+    """Save one run as `<key>-<ns>/` (temp dir + atomic rename) and return its PNG paths.
+
+    Every run gets its own entry, so re-rolling the same settings never touches files an
+    older history item still points at; lookups pick the newest complete run.
+    """
+    entry = IMAGE_CACHE_DIR / f"{key}-{time.time_ns()}"
+    tmp = IMAGE_CACHE_DIR / f".{entry.name}.tmp"
+    try:
+        tmp.mkdir(parents=True)
+        files = []
+        for i, png in enumerate(images_png):
+            (tmp / f"{i}.png").write_bytes(png)
+            files.append(f"{i}.png")
+        manifest = {"params": params, "files": files, "complete": complete}
+        (tmp / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+        tmp.rename(entry)
+    except OSError as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise OSError(f"Could not save generated images under {IMAGE_CACHE_DIR}") from e
+    return [str(entry / f) for f in files]
 
-def b64_to_pil(b64png: str) -> Image.Image:
-    return Image.open(io.BytesIO(base64.b64decode(b64png)))
+
+IMAGE_CACHE_MAX_BYTES = 500 * 1024 * 1024
+IMAGE_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds
+
+
+def prune_image_cache(keep: Optional[Path] = None) -> None:
+    """Drop runs older than IMAGE_CACHE_MAX_AGE, then the oldest until under IMAGE_CACHE_MAX_BYTES.
+
+    History items whose files were pruned are dropped from the gallery (see `prune_missing`).
+    """
+    try:
+        entries = [e for e in IMAGE_CACHE_DIR.iterdir() if e.is_dir()]
+        sized = []
+        for e in entries:
+            sized.append((e.stat().st_mtime, sum(f.stat().st_size for f in e.iterdir() if f.is_file()), e))
+    except OSError:
+        return
+    sized.sort(key=lambda t: t[0])
+    now = time.time()
+    total = sum(size for _, size, _ in sized)
+    for mtime, size, entry in sized:
+        if entry == keep:
+            continue
+        expired = now - mtime > IMAGE_CACHE_MAX_AGE
+        # Temp dirs belong to a write in progress; only clear them once they are clearly abandoned.
+        over_budget = total > IMAGE_CACHE_MAX_BYTES and not entry.name.startswith(".")
+        if expired or over_budget:
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+@dataclass
+class GenResult:
+    """One image-studio run. The PNGs live on disk; only their paths are kept in session state."""
+    prompt: str
+    size: str
+    image_paths: List[str]
+
+
+def prune_missing(history: List[GenResult]) -> List[GenResult]:
+    """History without files that have left the disk cache; runs with none left are dropped."""
+    pruned = []
+    for run in history:
+        paths = [p for p in run.image_paths if Path(p).is_file()]
+        if paths:
+            pruned.append(run if len(paths) == len(run.image_paths) else GenResult(run.prompt, run.size, paths))
+    return pruned
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def read_png(path: str) -> bytes:
+    """PNG bytes for a cached image (each run directory is written once and never rewritten)."""
+    return Path(path).read_bytes()
+
+
+PREVIEW_MAX_SIDE = 800  # 2-column preview never displays wider than this
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def render_thumb(path: str, max_side: int = 384) -> bytes:
+    """Downscaled copy of a gallery image; JPEG unless it needs to keep its alpha channel."""
+    img = Image.open(path)
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    buf = io.BytesIO()
+    if img.mode in ("RGBA", "LA", "P"):
+        img.save(buf, format="PNG", optimize=True)
+    else:
+        img.convert("RGB").save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
 
 
 # ------------------------------------------------------------
@@ -143,42 +464,41 @@ tab_chat, tab_image = st.tabs(["💬 Chat Assistant", "🖼️ Image Studio"])
 # ============================================================
 # 💬 CHAT ASSISTANT
 # ============================================================
-with tab_chat:
-    col1, col2 = st.columns([2, 1])
-
-    with col1:
-        st.subheader(f"{role} — Creative Assistant")
-        user_input = st.text_area(
-            "Enter your question or idea:",
-            placeholder="e.g. How can I shoot a dream sequence?",
-            height=130
-        )
-        if st.button("✨ Generate Response", use_container_width=True):
-            if not user_input.strip():
-                st.warning("Please enter your question first.")
-            else:
-                response = generate_chat_response(user_input)
-                if response:
-                    st.session_state.chat_history.append({"role": "user", "content": user_input})
-                    st.session_state.chat_history.append({"role": "assistant", "content": response})
-
-    with col2:
-        st.subheader("💭 Conversation History (bubble view)")
-        if len(st.session_state.chat_history) == 0:
-            st.info("아직 대화가 없습니다. 질문을 한 번 해보세요!")
+# Each tab is a fragment: its own widgets rerun only that tab, while sidebar
+# changes still rerun the whole script (and refresh role/model/api_key).
+@st.fragment
+def render_chat_tab():
+    st.subheader(f"{ROLE_LABELS[role]} — Creative Assistant")
+    if st.button("🗑️ Clear history"):
+        st.session_state.chat_history.clear()
+
+    if len(st.session_state.chat_history) == 0:
+        st.info("아직 대화가 없습니다. 질문을 한 번 해보세요!")
+    for msg in st.session_state.chat_history:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
+
+    if user_input := st.chat_input("Enter your question or idea — e.g. How can I shoot a dream sequence?"):
+        if not user_input.strip():
+            st.warning("Please enter your question first.")
+        elif is_duplicate_submit(key := chat_request_key(user_input)):
+            st.info("That question was just answered — skipped the duplicate submit.")
         else:
-            for msg in st.session_state.chat_history:
-                if msg["role"] == "user":
-                    st.markdown(f'<div style="background:#DCF8C6;padding:8px 12px;border-radius:10px;margin:6px 0;">🧑‍🎨 <b>You:</b> {msg["content"]}</div>', unsafe_allow_html=True)
-                else:
-                    st.markdown(f'<div style="background:#E8E8E8;padding:8px 12px;border-radius:10px;margin:6px 0;">🤖 <b>AI:</b> {msg["content"]}</div>', unsafe_allow_html=True)
-        if st.button("🗑️ Clear history"):
-            st.session_state.chat_history.clear()
+            with st.chat_message("user"):
+                st.markdown(user_input)
+            with st.chat_message("assistant"):
+                response = generate_chat_response(key)
+            if response:
+                st.session_state.chat_history.append({"role": "user", "content": user_input})
+                st.session_state.chat_history.append({"role": "assistant", "content": response})
+                # History changed, so this is a new key; earlier messages' token counts are memoized.
+                mark_submitted(chat_request_key(user_input))
 
 # ============================================================
 # 🖼️ IMAGE STUDIO
 # ============================================================
-with tab_image:
+@st.fragment
+def render_image_tab():
     st.subheader("🖼️ AI Image Studio")
     st.caption("Visualize your creative idea with AI image generation.")
 
@@ -188,10 +508,12 @@ with tab_image:
         prompt = st.text_area("Image Prompt", placeholder="Describe your visual idea...", height=130)
         negative = st.text_input("Negative Prompt (optional)", placeholder="e.g. blurry, text artifacts, bad lighting")
     with colB:
-        size = st.selectbox("Image Size", ["1024x1024", "1344x768", "768x1344", "2048x2048"], index=0)
+        size = st.selectbox("Image Size", SIZES, index=0)
         n_images = st.slider("Number of Images", 1, 6, 3)
         bg_trans = st.toggle("Transparent Background", False)
         quality = st.select_slider("Quality", options=["standard", "hd"], value="standard")
+        reuse_cached = st.toggle("Reuse cached result", True,
+                                 help="Turn off to re-roll new variations for the same prompt and settings.")
 
     if st.button("🚀 Generate Images", type="primary", use_container_width=True):
         if not api_key:
@@ -199,34 +521,71 @@ with tab_image:
         elif not prompt.strip():
             st.warning("Please enter a prompt.")
         else:
-            client = get_client()
+            params = dict(
+                model="gpt-image-1",
+                prompt=style_prompt(role, prompt),
+                size=size,
+                quality=quality,
+                background="transparent" if bg_trans else "white"
+            )
+            key = image_cache_key(api_key, n=n_images, **params)
             with st.spinner("Generating images..."):
                 try:
-                    result = client.images.generate(
-                        model="gpt-image-1",
-                        prompt=f"{prompt}\nStyle: {role_info['prompt']}",
-                        size=size,
-                        n=n_images,
-                        quality=quality,
-                        background="transparent" if bg_trans else "white"
-                    )
-                    images_b64 = [d.b64_json for d in result.data]
-                    st.session_state.history.insert(0, images_b64)
-                    st.success("✅ Images generated successfully!")
+                    image_paths = load_cached_images(key) if reuse_cached else None
+                    if image_paths is not None:
+                        history = st.session_state.history
+                        if not history or history[0].image_paths != image_paths:
+                            history.insert(0, GenResult(prompt=prompt, size=size, image_paths=image_paths))
+                        st.info("♻️ Loaded from cache — turn off “Reuse cached result” to re-roll.")
+                    else:
+                        images_png, errors = run_async(_fanout(get_client(), n_images, **params))
+                        if not images_png:
+                            raise errors[0]
+                        # A partial run is kept in history but never served as a cache hit.
+                        image_paths = store_cached_images(key, dict(n=n_images, **params), images_png,
+                                                          complete=not errors)
+                        prune_image_cache(keep=Path(image_paths[0]).parent)
+                        st.session_state.history.insert(0, GenResult(prompt=prompt, size=size, image_paths=image_paths))
+                        if errors:
+                            st.warning(f"⚠️ {len(errors)} of {n_images} images failed: {errors[0]}")
+                        else:
+                            st.success("✅ Images generated successfully!")
                 except Exception as e:
                     st.error(str(e))
 
+    st.session_state.history = prune_missing(st.session_state.history)
     if st.session_state.history:
         st.markdown("### ⭐ Latest Results")
         cols = st.columns(2)
         latest = st.session_state.history[0]
-        for i, b64img in enumerate(latest):
+        for i, path in enumerate(latest.image_paths):
             with cols[i % 2]:
-                img = b64_to_pil(b64img)
-                st.image(img, use_column_width=True, caption=f"Image {i+1}")
-                buf = io.BytesIO()
-                img.save(buf, format="PNG")
-                st.download_button("Download", buf.getvalue(), f"image_{i+1}.png", "image/png")
+                try:
+                    preview, png = render_thumb(path, max_side=PREVIEW_MAX_SIDE), read_png(path)
+                except OSError:  # removed from disk since prune_missing ran
+                    st.caption(f"Image {i+1} is no longer available.")
+                    continue
+                st.image(preview, caption=f"Image {i+1}")
+                st.download_button("Download", png, f"image_{i+1}.png", "image/png", key=f"dl_latest_{i}")
+
+    if len(st.session_state.history) > 1:
+        # Older runs are only read from disk while the toggle is on (an expander would still run its body).
+        if st.toggle("🗂️ Show Generation History", key="show_history"):
+            for run_idx, run in enumerate(st.session_state.history[1:], start=1):
+                st.markdown(f"**Run {run_idx}** · {run.size} · {run.prompt}")
+                thumb_cols = st.columns(4)
+                for i, path in enumerate(run.image_paths):
+                    with thumb_cols[i % 4]:
+                        try:
+                            st.image(render_thumb(path))
+                        except OSError:
+                            st.caption("No longer available.")
+
+
+with tab_chat:
+    render_chat_tab()
+with tab_image:
+    render_image_tab()
 
 # ------------------------------------------------------------
 # Footer
@@ -0,0 +1,68 @@
+# ============================================================
+# 🎭 Shared role / model / size tables
+# Single source of truth for app.py; frozen so no rerun can mutate them.
+# ============================================================
+
+from enum import IntEnum
+from types import MappingProxyType
+
+MODELS = ("gpt-4.1-mini", "gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo")
+
+SIZES = ("1024x1024", "1344x768", "768x1344", "2048x2048")
+
+
+class Role(IntEnum):
+    VIDEO_DIRECTOR = 0
+    FASHION_DESIGNER = 1
+    STORYBOARD_ARTIST = 2
+    GRAPHIC_DESIGNER = 3
+    PERFORMER = 4
+
+
+ROLE_LABELS = (
+    "Video Director 🎬",
+    "Fashion Designer 👗",
+    "Storyboard Artist ✏️",
+    "Graphic Designer 🎨",
+    "Performer 🎭",
+)
+
+# Role descriptions & system prompts, indexed by Role
+ROLE_INFO = (
+    MappingProxyType({
+        "desc": "Analyzes mood, camera angle, lighting.",
+        "prompt": (
+            "You are a professional film director. Always analyze ideas in terms of visual storytelling — "
+            "use camera movement, lighting, framing, editing, and emotional tone to explain your thoughts. "
+            "Describe concepts as if you are planning a film scene or visual sequence."
+        )
+    }),
+    MappingProxyType({
+        "desc": "Focuses on color harmony, texture, silhouette.",
+        "prompt": (
+            "You are an avant-garde fashion designer. Think in terms of form, fabric, tone, "
+            "and how clothing expresses emotion, era, and identity."
+        )
+    }),
+    MappingProxyType({
+        "desc": "Creates composition sketches, camera layout, and timing cues.",
+        "prompt": (
+            "You are a storyboard artist. Visualize action beats, body language, and composition. "
+            "Explain the scene framing with cinematic clarity."
+        )
+    }),
+    MappingProxyType({
+        "desc": "Balances composition, typography, and color palette.",
+        "prompt": (
+            "You are a professional graphic designer. Focus on layout, composition, and how design communicates mood. "
+            "Think visually and describe spatial balance and rhythm."
+        )
+    }),
+    MappingProxyType({
+        "desc": "Analyzes emotion, posture, gesture, and audience impact.",
+        "prompt": (
+            "You are a stage performer and actor. Express emotional tone, gesture, and performance dynamics. "
+            "Explain how to evoke empathy and rhythm in storytelling."
+        )
+    }),
+)
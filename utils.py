@@ -0,0 +1,13 @@
+# ============================================================
+# 🧩 Pure helpers shared by the chat and image tabs
+# ============================================================
+
+import functools
+
+from roles import ROLE_INFO, Role
+
+
+@functools.lru_cache(maxsize=512)
+def style_prompt(role: Role, base: str) -> str:
+    """Final image prompt: the user's idea plus the selected role's system prompt as style."""
+    return f"{base}\nStyle: {ROLE_INFO[role]['prompt']}"